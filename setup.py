@@ -40,7 +40,7 @@ def get_requirements():
 
 setup(
     name='terrawrap',
-    python_requires='>=3.6.0',
+    python_requires='>=3.7.0',
     version=get_version(),
     description="Set of Python-based CLI tools for working with Terraform configurations",
     long_description=get_long_description(),
@@ -54,7 +54,6 @@ setup(
         'Operating System :: OS Independent',
         'Programming Language :: Python',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.6',
         'Programming Language :: Python :: 3.7',
         'Programming Language :: Python :: 3.8',
         'Programming Language :: Python :: 3.9',
@@ -9,3 +9,7 @@ class NotTerraformConfigDirectory(RuntimeError):
 
 class NoDependency(Exception):
     """Error raised when processing a directory that contains .tf_wrapper config files with no dependency"""
+
+
+class InvalidWrapperConfig(RuntimeError):
+    """Error raised when a wrapper config file contains unknown or invalid fields"""
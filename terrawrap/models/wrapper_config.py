@@ -1,11 +1,12 @@
 """Data classes to represent the wrapper config file"""
-# TODO: convert these classes to dataclasses once we drop support for Python3.6
 # pylint: disable=missing-docstring
 
+import sys
+from dataclasses import dataclass, field
 from enum import Enum
 from typing import Dict, Optional, List
 
-import jsons
+from terrawrap.exceptions import InvalidWrapperConfig
 
 
 class EnvVarSource(Enum):
@@ -14,125 +15,183 @@ class EnvVarSource(Enum):
     UNSET = 'unset'
 
 
+# Bind the enum members and their values once, so constructing or deserializing env var
+# configs doesn't repeat the Enum attribute lookups for every entry.
+_SSM_SOURCE = EnvVarSource.SSM
+_TEXT_SOURCE = EnvVarSource.TEXT
+_UNSET_SOURCE = EnvVarSource.UNSET
+
+
+# The env var configs use __slots__ because a large tree holds one instance per env var
+# per config directory, so dropping the per-instance __dict__ adds up.
 class AbstractEnvVarConfig:
+    __slots__ = ('source',)
+
     def __init__(self, source: EnvVarSource):
         self.source = source
 
+    @staticmethod
+    def from_dict(obj_dict: Dict) -> 'AbstractEnvVarConfig':
+        """Convert a dict to the appropriate subclass of AbstractEnvVarConfig"""
+        try:
+            return env_var_deserializer(obj_dict, AbstractEnvVarConfig)
+        except (KeyError, TypeError) as exception:
+            raise InvalidWrapperConfig(
+                f'Cannot parse env var config from {obj_dict}: {exception}'
+            ) from exception
+
 
 class SSMEnvVarConfig(AbstractEnvVarConfig):
+    __slots__ = ('path',)
+
     def __init__(self, path: str):
-        super().__init__(EnvVarSource.SSM)
+        super().__init__(_SSM_SOURCE)
         self.path = path
 
 
 class TextEnvVarConfig(AbstractEnvVarConfig):
+    __slots__ = ('value',)
+
     def __init__(self, value: str):
-        super().__init__(EnvVarSource.TEXT)
+        super().__init__(_TEXT_SOURCE)
         self.value = value
 
 
 class UnsetEnvVarConfig(AbstractEnvVarConfig):
+    __slots__ = ()
+
     def __init__(self):
-        super().__init__(EnvVarSource.UNSET)
+        super().__init__(_UNSET_SOURCE)
 
 
+@dataclass
 class HTTPBackendConfig:
-    def __init(
-            self,
-            address: str = None,
-            update_method: str = None,
-            lock_address: str = None,
-            lock_method: str = None,
-            unlock_address: str = None,
-            unlock_method: str = None,
-            username: str = None,
-            password: str = None,
-            skip_cert_verification: str = None,
-            retry_max: str = None,
-            retry_wait_min: str = None,
-            retry_wait_max: str = None,
-    ):
-        self.address = address
-        self.update_method = update_method
-        self.lock_address = lock_address
-        self.lock_method = lock_method
-        self.unlock_address = unlock_address
-        self.unlock_method = unlock_method
-        self.username = username
-        self.password = password
-        self.skip_cert_verifications = skip_cert_verification
-        self.retry_max = retry_max
-        self.retry_wait_min = retry_wait_min
-        self.retry_wait_max = retry_wait_max
-
-
+    address: Optional[str] = None
+    update_method: Optional[str] = None
+    lock_address: Optional[str] = None
+    lock_method: Optional[str] = None
+    unlock_address: Optional[str] = None
+    unlock_method: Optional[str] = None
+    username: Optional[str] = None
+    password: Optional[str] = None
+    skip_cert_verification: Optional[str] = None
+    retry_max: Optional[str] = None
+    retry_wait_min: Optional[str] = None
+    retry_wait_max: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, obj_dict: Dict) -> 'HTTPBackendConfig':
+        return _construct_strictly(cls, obj_dict)
+
+
+@dataclass
 class S3BackendConfig:
-    def __init__(
-            self,
-            bucket: str = None,
-            region: str = None,
-            dynamodb_table: str = None,
-            role_arn: str = None,
-    ):
-        self.region = region
-        self.bucket = bucket
-        self.dynamodb_table = dynamodb_table
-        self.role_arn = role_arn
+    bucket: Optional[str] = None
+    region: Optional[str] = None
+    dynamodb_table: Optional[str] = None
+    role_arn: Optional[str] = None
 
+    @classmethod
+    def from_dict(cls, obj_dict: Dict) -> 'S3BackendConfig':
+        return _construct_strictly(cls, obj_dict)
 
+
+@dataclass
 class GCSBackendConfig:
-    def __init__(self, bucket: str = None):
-        self.bucket = bucket
+    bucket: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, obj_dict: Dict) -> 'GCSBackendConfig':
+        return _construct_strictly(cls, obj_dict)
 
 
+@dataclass
 class BackendsConfig:
     # pylint: disable=invalid-name
-    def __init__(self, s3: Optional[S3BackendConfig] = None, gcs: Optional[GCSBackendConfig] = None, http: Optional[HTTPBackendConfig] = None):
-        self.http = http
-        self.s3 = s3
-        self.gcs = gcs
+    s3: Optional[S3BackendConfig] = None
+    gcs: Optional[GCSBackendConfig] = None
+    http: Optional[HTTPBackendConfig] = None
+
+    @classmethod
+    def from_dict(cls, obj_dict: Dict) -> 'BackendsConfig':
+        unknown_keys = set(obj_dict) - {'s3', 'gcs', 'http'}
+        if unknown_keys:
+            raise InvalidWrapperConfig(
+                f'Unknown backends in {obj_dict}: {sorted(unknown_keys)}'
+            )
+        return cls(
+            s3=S3BackendConfig.from_dict(obj_dict['s3']) if obj_dict.get('s3') is not None else None,
+            gcs=GCSBackendConfig.from_dict(obj_dict['gcs']) if obj_dict.get('gcs') is not None else None,
+            http=HTTPBackendConfig.from_dict(obj_dict['http']) if obj_dict.get('http') is not None else None,
+        )
+
+
+def _construct_strictly(cls, obj_dict: Dict):
+    """Construct the given config class from a dict, rejecting unknown fields"""
+    try:
+        return cls(**obj_dict)
+    except TypeError as exception:
+        raise InvalidWrapperConfig(
+            f'Cannot parse {cls.__name__} from {obj_dict}: {exception}'
+        ) from exception
+
+
+# Dispatch table so picking the env var config class is a single dict lookup instead of
+# comparing the source against each EnvVarSource value in turn.
+_ENV_VAR_CONSTRUCTORS = {
+    _SSM_SOURCE.value: lambda obj_dict: SSMEnvVarConfig(obj_dict['path']),
+    _TEXT_SOURCE.value: lambda obj_dict: TextEnvVarConfig(obj_dict['value']),
+    _UNSET_SOURCE.value: lambda obj_dict: UnsetEnvVarConfig(),
+}
 
 
 # pylint: disable=unused-argument
 def env_var_deserializer(obj_dict, cls, **kwargs):
     """convert a dict to a subclass of AbstractEnvVarConfig"""
-    if obj_dict['source'] == EnvVarSource.SSM.value:
-        return SSMEnvVarConfig(obj_dict['path'])
-    if obj_dict['source'] == EnvVarSource.TEXT.value:
-        return TextEnvVarConfig(obj_dict['value'])
-    if obj_dict['source'] == EnvVarSource.UNSET.value:
-        return UnsetEnvVarConfig()
-
-    raise RuntimeError('Invalid Source')
-
-
-jsons.set_deserializer(env_var_deserializer, AbstractEnvVarConfig)
+    constructor = _ENV_VAR_CONSTRUCTORS.get(obj_dict['source'])
+    if constructor is None:
+        raise InvalidWrapperConfig('Invalid Source')
+    return constructor(obj_dict)
 
 
-# pylint: disable=too-many-arguments
+@dataclass
 class WrapperConfig:
-    def __init__(
-            self,
-            configure_backend: bool = True,
-            pipeline_check: bool = True,
-            backend_check: bool = True,
-            plan_check: bool = True,
-            envvars: Dict[str, AbstractEnvVarConfig] = None,
-            backends: BackendsConfig = None,
-            depends_on: List[str] = None,
-            config: bool = True,
-            audit_api_url: str = None,
-            apply_automatically: bool = True,
-            plugins: Dict[str, str] = None
-    ):
-        self.configure_backend = configure_backend
-        self.pipeline_check = pipeline_check
-        self.backend_check = backend_check
-        self.plan_check = plan_check
-        self.envvars = envvars or {}
-        self.backends = backends
-        self.depends_on = depends_on
-        self.config = config
-        self.audit_api_url = audit_api_url
-        self.apply_automatically = apply_automatically
-        self.plugins = plugins or {}
+    configure_backend: bool = True
+    pipeline_check: bool = True
+    backend_check: bool = True
+    plan_check: bool = True
+    envvars: Dict[str, AbstractEnvVarConfig] = field(default_factory=dict)
+    backends: Optional[BackendsConfig] = None
+    depends_on: Optional[List[str]] = None
+    config: bool = True
+    audit_api_url: Optional[str] = None
+    apply_automatically: bool = True
+    plugins: Dict[str, str] = field(default_factory=dict)
+
+    def __post_init__(self):
+        # Intern the keys: names like AWS_REGION repeat across many configs, so interning
+        # dedupes the strings and lets dict lookups take the pointer-equality fast path.
+        self.envvars = {
+            sys.intern(key): value for key, value in self.envvars.items()
+        } if self.envvars else {}
+        self.plugins = {
+            sys.intern(key): value for key, value in self.plugins.items()
+        } if self.plugins else {}
+
+    @classmethod
+    def from_dict(cls, obj_dict: Dict) -> 'WrapperConfig':
+        """Convert a dict parsed from a wrapper config file to a WrapperConfig"""
+        obj_dict = dict(obj_dict)
+        envvars = obj_dict.pop('envvars', None)
+        backends = obj_dict.pop('backends', None)
+        return _construct_strictly(
+            cls,
+            {
+                **obj_dict,
+                'envvars': {
+                    name: AbstractEnvVarConfig.from_dict(envvar_dict)
+                    for name, envvar_dict in envvars.items()
+                } if envvars else {},
+                'backends': BackendsConfig.from_dict(backends) if backends else None,
+            },
+        )
@@ -1,14 +1,22 @@
 """Module for containing CLI convenience functions"""
 from __future__ import print_function
 
+import codecs
+import concurrent.futures
 import getpass
+import json
 import logging
+import os
+import re
+import select
 import subprocess
-import tempfile
+import sys
 
-from typing import List, Tuple, Union
+from functools import lru_cache
+from typing import List, Optional, Tuple, Union
 
 import requests
+import urllib3
 
 from amplify_aws_utils.resource_helper import Jitter
 
@@ -16,8 +24,31 @@ from terrawrap.utils.git_utils import get_git_root
 
 logger = logging.getLogger(__name__)
 
+# The git root for a given path doesn't change within a run, so cache it to avoid
+# repeating the git invocation for every command posted to the audit API.
+_cached_git_root = lru_cache(maxsize=32)(get_git_root)
+
+# Worker for audit API posts. ThreadPoolExecutor spawns no thread until the first
+# submit, so runs that don't use the audit API pay nothing, and creating it eagerly
+# keeps concurrent execute_command callers from racing on initialization. Pending
+# posts are drained at interpreter exit by concurrent.futures' own atexit hook.
+_AUDIT_API_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+# Reuse one session for all audit API posts so the TLS handshake and TCP setup are
+# only paid once per run instead of once per command.
+_AUDIT_API_SESSION = requests.Session()
+_AUDIT_API_SESSION.mount(
+    'https://',
+    requests.adapters.HTTPAdapter(max_retries=urllib3.util.Retry(total=2, backoff_factor=0.3)),
+)
+_AUDIT_API_TIMEOUT = (3.05, 10)
+_AUDIT_API_HEADERS = {'Content-Type': 'application/json'}
+
+# The user running the wrapper can't change mid-process, so look it up once.
+_CURRENT_USER = getpass.getuser()
+
 MAX_RETRIES = 5
-RETRIABLE_ERRORS = [
+RETRIABLE_ERRORS = (
     'RequestError: send request failed',
     'unexpected EOF',
     'Throttling',
@@ -35,9 +66,32 @@ RETRIABLE_ERRORS = [
     'ConditionalCheckFailedException',
     'Api Rate Limit Exceeded',
     'TooManyUpdates',
-]
-
-
+)
+
+# Single compiled pattern so each line is scanned once at C speed instead of once per
+# error string in a Python loop.
+_RETRIABLE_RE = re.compile('|'.join(re.escape(error) for error in RETRIABLE_ERRORS))
+
+# Every entry in RETRIABLE_ERRORS contains at least one of these substrings (covered by
+# a test), so output that contains none of them can skip the regex scan entirely.
+# str.__contains__ scans at memchr speed, which makes the common error-free case much
+# cheaper than running the alternation regex over a large log.
+_RETRIABLE_ANCHORS = (
+    'rror',
+    'EOF',
+    'hrottl',
+    'imeout',
+    'navailab',
+    'eset',
+    'again',
+    'imit',
+    'ondition',
+    'TooMany',
+    'SSL_',
+)
+
+
+# pylint: disable=too-many-locals
 def execute_command(
         args: Union[List[str], str],
         *pargs,
@@ -46,7 +100,8 @@ def execute_command(
         print_command: bool = False,
         retry: bool = False,
         timeout: int = 15 * 60,
-        audit_api_url: str = None,
+        audit_api_url: Optional[str] = None,
+        collect_output: bool = True,
         **kwargs
 ) -> Tuple[int, List[str]]:
     """
@@ -59,16 +114,21 @@ def execute_command(
     :param timeout: Max amount of time to keep retrying to execute command. Defaults to 15 minutes.
     :param retry: Retry a number of times if network errors. Defaults to False.
     :param audit_api_url: Audit API URL to submit POST request. Defaults to None so no data is sent.
+    :param collect_output: True if the full output should be returned. When False only the last 64KB
+    of output is kept for retry detection and an empty list is returned, which keeps memory flat for
+    callers that only need the exit code. Defaults to True.
     :param kwargs: Any additional keyword arguments to Popen.
     :return: A tuple of the exit code and output of the command.
     """
     try_count = 0
 
-    # It's possible for an envvar to be set to none, so exclude those envvars.
-    if 'env' in kwargs:
+    # It's possible for an envvar to be set to none, so exclude those envvars. Only
+    # rebuild the dict when a None value actually exists; usually none do.
+    env = kwargs.get('env')
+    if env is not None and None in env.values():
         kwargs['env'] = {
             key: value
-            for key, value in kwargs['env'].items()
+            for key, value in env.items()
             if value is not None
         }
 
@@ -83,14 +143,25 @@ def execute_command(
             capture_stderr,
             print_command,
             *pargs,
+            collect_output=collect_output,
             **kwargs,
         )
 
         try_count += 1
 
-        network_errors = _get_retriable_errors(stdout)
-        if exit_code != 0 and network_errors and retry:
-            logger.warning('Found network errors while running %s command: %s', args, network_errors)
+        if not retry:
+            # The caller opted out of retries, so don't bother scanning the output
+            # for retriable errors at all.
+            break
+
+        if exit_code != 0 and _has_retriable_error(''.join(stdout)):
+            # Only build the per-line error list if the warning will actually be emitted.
+            if logger.isEnabledFor(logging.WARNING):
+                logger.warning(
+                    'Found network errors while running %s command: %s',
+                    args,
+                    _get_retriable_errors(stdout),
+                )
         else:
             # The command either succeeded or failed with a non network error. don't retry
             break
@@ -100,18 +171,24 @@ def execute_command(
 
         time_passed = jitter.backoff()
 
+    if not collect_output:
+        # The returned list only held the retry-detection tail; don't leak it to the caller.
+        stdout = []
+
     if audit_api_url and kwargs['cwd']:
-        _post_to_audit_api_url(audit_api_url, kwargs['cwd'], exit_code, stdout)
+        _submit_audit_api_post(audit_api_url, kwargs['cwd'], exit_code, stdout)
 
     return exit_code, stdout
 
 
+# pylint: disable=too-many-locals
 def _execute_command(
         args: Union[List[str], str],
         print_output: bool,
         capture_stderr: bool,
         print_command: bool,
         *pargs,
+        collect_output: bool = True,
         **kwargs
 ) -> Tuple[int, List[str]]:
     """
@@ -120,71 +197,137 @@ def _execute_command(
     :param print_output: True if the output of the command should be printed immediately. Defaults to True.
     :param capture_stderr: True if stderr should be captured. Defaults to True.
     :param print_command: True if the command should be printed before executing. Defaults to False.
+    :param collect_output: True if every output line should be kept. When False only a rolling tail
+    of roughly 64KB is retained so retriable errors can still be detected. Defaults to True.
     :param pargs: Any additional positional arguments to Popen.
     :param kwargs: Any additional keyword arguments to Popen.
     :return: A tuple of the exit code and output of the command.
     """
-    stdout_write, stdout_path = tempfile.mkstemp()
-    with open(stdout_path, "rb") as stdout_read, open('/dev/null', 'w', encoding='utf-8') as dev_null:
+    if print_command:
+        print(f"Executing: {' '.join(args)}")
 
-        if print_command:
-            print(f"Executing: {' '.join(args)}")
+    kwargs['stdout'] = subprocess.PIPE
+    kwargs['stderr'] = subprocess.STDOUT if capture_stderr else subprocess.DEVNULL
 
-        kwargs['stdout'] = stdout_write
-        kwargs['stderr'] = stdout_write if capture_stderr else dev_null
+    # pylint: disable=consider-using-with
+    process = subprocess.Popen(
+        args,
+        *pargs,
+        **kwargs
+    )
+
+    # Stream output directly from the pipe instead of bouncing it through a temp file,
+    # which avoids writing and re-reading the entire output on disk for every command.
+    # select() sleeps the thread until output is available or the child exits, so quiet
+    # stretches (long plan phases) don't burn CPU, and os.read pulls 64KB blocks. The
+    # incremental decoder holds onto multi-byte UTF-8 sequences split across blocks.
+    assert process.stdout is not None  # guaranteed by stdout=PIPE above
+    pipe_fd = process.stdout.fileno()
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    stdout: List[str] = []
+    tail_size = 0
+    pending = ''
+
+    def append_line(line: str):
+        nonlocal tail_size
+        stdout.append(line)
+        if not collect_output:
+            # Keep only a rolling tail large enough for retriable error detection.
+            tail_size += len(line)
+            while tail_size > 65536 and len(stdout) > 1:
+                tail_size -= len(stdout.pop(0))
+
+    exited = False
+    while True:
+        # Once the child has exited, keep draining with a zero timeout until the pipe
+        # is empty, so output written between the select timeout and the poll isn't lost.
+        ready, _, _ = select.select([pipe_fd], [], [], 0 if exited else 0.25)
+
+        if not ready:
+            if exited:
+                break
+            exited = process.poll() is not None
+            continue
 
-        # pylint: disable=consider-using-with
-        process = subprocess.Popen(
-            args,
-            *pargs,
-            **kwargs
-        )
+        chunk = os.read(pipe_fd, 65536)
+        if not chunk:
+            break
 
-        while True:
-            output = stdout_read.read(1).decode(errors="replace")
+        output = decoder.decode(chunk)
+        if print_output and output:
+            sys.stdout.write(output)
+            sys.stdout.flush()
 
-            if output == '' and process.poll() is not None:
-                break
+        pending += output
+        if '\n' in pending:
+            lines = pending.splitlines(keepends=True)
+            pending = '' if lines[-1].endswith('\n') else lines.pop()
+            for line in lines:
+                append_line(line)
+
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        append_line(pending)
 
-            if print_output and output:
-                print(output, end="", flush=True)
+    exit_code = process.poll()
+    if exit_code is None:
+        exit_code = process.wait()
 
-        exit_code = process.poll()
+    return exit_code, stdout
 
-        stdout_read.seek(0)
-        stdout = [line.decode(errors="replace") for line in stdout_read.readlines()]
 
-        # ignoring mypy error below because it thinks exit_code can sometimes be None
-        # we know that will never be the case because the above While loop will keep looping forever
-        # until exit_code is not None
-        return exit_code, stdout  # type: ignore
+def _has_retriable_error(output: str) -> bool:
+    """Check whether the given output contains any retriable error"""
+    if not any(anchor in output for anchor in _RETRIABLE_ANCHORS):
+        return False
+    return bool(_RETRIABLE_RE.search(output))
 
 
 def _get_retriable_errors(out: List[str]) -> List[str]:
     """Filter line output for retriable errors"""
-    return [
-        line for line in out
-        if any(error in line for error in RETRIABLE_ERRORS)
-    ]
+    return [line for line in out if _RETRIABLE_RE.search(line)]
+
+
+def _submit_audit_api_post(audit_api_url: str, path: str, exit_code: int, stdout: List[str]):
+    """
+    Post to the audit API from a background thread so the command doesn't block on the
+    network round trip. Pending posts are flushed at interpreter exit.
+    """
+    _AUDIT_API_EXECUTOR.submit(_post_to_audit_api_url, audit_api_url, path, exit_code, stdout)
+
+
+def flush_audit_api_posts():
+    """Block until any pending audit API posts have completed"""
+    # The single worker runs posts in submission order, so a barrier task completing
+    # means everything submitted before it has finished.
+    _AUDIT_API_EXECUTOR.submit(lambda: None).result()
 
 
 def _post_to_audit_api_url(audit_api_url: str, path: str, exit_code: int, stdout: List[str]):
-    root = get_git_root(path)
+    root = _cached_git_root(path)
     path = path.replace(root, '')
 
     status = 'SUCCESS' if exit_code == 0 else 'FAILED'
-    user = getpass.getuser()
+    user = _CURRENT_USER
 
     logger.info('Attempting to send data to Audit API: %s run by %s(%s)', path, user, status)
 
+    # Serialize the body up front and reuse the shared headers, rather than having
+    # requests rebuild both for every post.
+    payload = json.dumps({
+        'directory': path,
+        'status': status,
+        'run_by': user,
+        'output': stdout
+    }).encode('utf-8')
+
     try:
-        requests.post(
-            audit_api_url, json={
-                'directory': path,
-                'status': status,
-                'run_by': user,
-                'output': stdout
-            })
+        _AUDIT_API_SESSION.post(
+            audit_api_url,
+            data=payload,
+            headers=_AUDIT_API_HEADERS,
+            timeout=_AUDIT_API_TIMEOUT,
+        )
         logger.info('Successfully posted data to provided url: %s', audit_api_url)
     except requests.exceptions.RequestException:
         logger.error("Unable to post data to provided url: %s", audit_api_url)
@@ -1,16 +1,16 @@
 """Holds config utilities"""
+import copy
 import os
 import sys
+from functools import lru_cache
 from typing import Dict, List, Optional, Tuple
 import networkx
 
 import hcl2
-import jsons
 import yaml
-from jsons import DeserializationError
 from ssm_cache import SSMParameterGroup
 
-from terrawrap.exceptions import NotTerraformConfigDirectory, NoDependency
+from terrawrap.exceptions import NotTerraformConfigDirectory, NoDependency, InvalidWrapperConfig
 from terrawrap.models.wrapper_config import (
     WrapperConfig,
     AbstractEnvVarConfig,
@@ -26,6 +26,11 @@ DEFAULT_REGION = 'us-west-2'
 SSM_ENVVAR_CACHE = SSMParameterGroup(max_age=600)
 TF_WRAP_FILE = ".tf_wrapper"
 
+# Use the libyaml C loader when available; it parses wrapper configs several times
+# faster than the pure Python loader and falls back transparently when PyYAML was
+# built without libyaml.
+_YamlSafeLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
 
 def find_variable_files(path: str) -> List[str]:
     """
@@ -71,9 +76,31 @@ def find_wrapper_config_files(path: str) -> List[str]:
     return wrapper_config_files
 
 
+# pylint: disable=unused-argument
+@lru_cache(maxsize=256)
+def _parse_wrapper_config_file(wrapper_config_path: str, mtime_ns: int, size: int) -> Optional[Dict]:
+    """
+    Read and parse a single wrapper config file. The mtime and size are part of the cache
+    key so that editing a config file invalidates its cache entry.
+    :param wrapper_config_path: The path to the wrapper config file.
+    :param mtime_ns: The file's modification time, from os.stat.
+    :param size: The file's size, from os.stat.
+    :return: The parsed contents of the file, or None if it doesn't contain a dict.
+    """
+    with open(wrapper_config_path, encoding='utf-8') as wrapper_config_file:
+        wrapper_config = yaml.load(wrapper_config_file, Loader=_YamlSafeLoader)
+    return wrapper_config if isinstance(wrapper_config, dict) else None
+
+
+def clear_wrapper_config_cache():
+    """Clear the cache of parsed wrapper config files"""
+    _parse_wrapper_config_file.cache_clear()
+
+
 def parse_wrapper_configs(wrapper_config_files: List[str]) -> WrapperConfig:
     """
-    Function for parsing the Terraform wrapper config file.
+    Function for parsing the Terraform wrapper config file. Parsing is cached per file, so
+    walking a large tree of config directories only reads each shared ancestor config once.
     :param wrapper_config_files: A list of file paths to wrapper config files. Config files later in the list
     override those earlier in the list, and are merged with the default config and earlier files.
     :return: A WrapperConfig object representing the accumulated values of all the wrapper config files
@@ -81,15 +108,16 @@ def parse_wrapper_configs(wrapper_config_files: List[str]) -> WrapperConfig:
     generated_wrapper_config: Dict = {}
 
     for wrapper_config_path in wrapper_config_files:
-        with open(wrapper_config_path, encoding='utf-8') as wrapper_config_file:
-            wrapper_config = yaml.safe_load(wrapper_config_file)
-            if wrapper_config and isinstance(wrapper_config, dict):
-                generated_wrapper_config = update(generated_wrapper_config, wrapper_config)
+        stat = os.stat(wrapper_config_path)
+        wrapper_config = _parse_wrapper_config_file(wrapper_config_path, stat.st_mtime_ns, stat.st_size)
+        if wrapper_config:
+            # update() mutates its inputs' nested values, so merge a copy to keep the
+            # cached dict pristine.
+            generated_wrapper_config = update(generated_wrapper_config, copy.deepcopy(wrapper_config))
 
     try:
-        wrapper_config_obj: WrapperConfig = jsons.load(generated_wrapper_config, WrapperConfig, strict=True)
-        return wrapper_config_obj
-    except DeserializationError as exception:
+        return WrapperConfig.from_dict(generated_wrapper_config)
+    except InvalidWrapperConfig as exception:
         print(f"Cannot parse wrapper config from files: {wrapper_config_files}")
         raise exception
 
@@ -271,9 +299,19 @@ def resolve_envvars(envvar_configs: Dict[str, AbstractEnvVarConfig]) -> Dict[str
     name of the environment variable and the value being the value of the environment variable.
     """
     resolved_envvars = {}
+
+    # Register every SSM parameter with the cache group before reading any values, so the
+    # first value access refreshes them all with batched get_parameters calls instead of
+    # one round trip per parameter.
+    ssm_parameters = {
+        envvar_name: SSM_ENVVAR_CACHE.parameter(envvar_config.path)
+        for envvar_name, envvar_config in envvar_configs.items()
+        if isinstance(envvar_config, SSMEnvVarConfig)
+    }
+
     for envvar_name, envvar_config in envvar_configs.items():
         if isinstance(envvar_config, SSMEnvVarConfig):
-            resolved_envvars[envvar_name] = SSM_ENVVAR_CACHE.parameter(envvar_config.path).value
+            resolved_envvars[envvar_name] = ssm_parameters[envvar_name].value
         if isinstance(envvar_config, TextEnvVarConfig):
             resolved_envvars[envvar_name] = str(envvar_config.value)
         if isinstance(envvar_config, UnsetEnvVarConfig):
@@ -381,7 +419,7 @@ def _parse_backend_config_for_file(file_path: str) -> Optional[BackendsConfig]:
             terraform_config_blocks: List[Dict] = configs.get('terraform', [])
             for terraform_config in terraform_config_blocks:
                 if 'backend' in terraform_config:
-                    return jsons.load(terraform_config['backend'][0], BackendsConfig, strict=True)
+                    return BackendsConfig.from_dict(terraform_config['backend'][0])
             return None
         except Exception:
             print(f'Error while parsing file {file_path}')
@@ -6,7 +6,14 @@ from mock import patch
 
 import requests_mock
 
-from terrawrap.utils.cli import execute_command, MAX_RETRIES
+from terrawrap.utils.cli import (
+    execute_command,
+    flush_audit_api_posts,
+    MAX_RETRIES,
+    RETRIABLE_ERRORS,
+    _has_retriable_error,
+    _RETRIABLE_ANCHORS,
+)
 
 
 class TestCli(TestCase):
@@ -17,6 +24,12 @@ class TestCli(TestCase):
         self.mock_popen = self.popen_patcher.start()
         self.mock_process = self.mock_popen.return_value
 
+        # Give the mocked process a real pipe that is already at EOF, so the
+        # select/os.read loop in _execute_command sees the output as finished.
+        self.stdout_read_fd, stdout_write_fd = os.pipe()
+        os.close(stdout_write_fd)
+        self.mock_process.stdout.fileno.return_value = self.stdout_read_fd
+
         self.jitter_patcher = patch('terrawrap.utils.cli.Jitter')
         self.mock_jitter = self.jitter_patcher.start()
         self.mock_jitter.return_value.backoff.return_value = 3
@@ -24,6 +37,7 @@ class TestCli(TestCase):
     def tearDown(self):
         self.popen_patcher.stop()
         self.jitter_patcher.stop()
+        os.close(self.stdout_read_fd)
 
     def test_execute_command(self):
         """Test executing a command successfully"""
@@ -34,14 +48,11 @@ class TestCli(TestCase):
         self.assertEqual(exit_code, 0)
         self.assertEqual(stdout, [])
 
-    @patch('terrawrap.utils.cli._get_retriable_errors')
-    @patch('io.open')
-    def test_execute_command_retry(self, mock_open, mock_network_error):
+    @patch('terrawrap.utils.cli._has_retriable_error')
+    def test_execute_command_retry(self, mock_network_error):
         """Test retrying execution because of network errors"""
-        self.mock_process.poll.side_effect = [1, 1, 1, 0]
-        mock_network_error.side_effect = [["Throttling"], []]
-        mock_stdout_read = mock_open.return_value
-        mock_stdout_read.readline.return_value = b''
+        self.mock_process.poll.side_effect = [1, 0]
+        mock_network_error.side_effect = [True, False]
 
         exit_code, stdout = execute_command(['echo', '1'], retry=True)
 
@@ -49,21 +60,11 @@ class TestCli(TestCase):
         self.assertEqual(exit_code, 0)
         self.assertEqual(stdout, [])
 
-    @patch('terrawrap.utils.cli._get_retriable_errors')
-    @patch('io.open')
-    def test_execute_command_max_retry(self, mock_open, mock_network_error):
+    @patch('terrawrap.utils.cli._has_retriable_error')
+    def test_execute_command_max_retry(self, mock_network_error):
         """Test retrying execution because of network errors up to 5 times"""
         self.mock_process.poll.return_value = 255
-        mock_network_error.side_effect = [
-            ["Throttling"],
-            ["unexpected EOF"],
-            ["Throttling"],
-            ["unexpected EOF"],
-            ["Throttling"],
-            ["unexpected EOF"]
-        ]
-        mock_stdout_read = mock_open.return_value
-        mock_stdout_read.readline.return_value = b''
+        mock_network_error.return_value = True
 
         exit_code, stdout = execute_command(['echo', '1'], retry=True)
 
@@ -71,11 +72,9 @@ class TestCli(TestCase):
         self.assertEqual(exit_code, 255)
         self.assertEqual(stdout, [])
 
-    @patch('getpass.getuser')
-    def test_set_audit_api_url(self, mock_getuser_func):
+    @patch('terrawrap.utils.cli._CURRENT_USER', 'mockuser')
+    def test_set_audit_api_url(self):
         """Test sending data to given url"""
-        mock_getuser_func.return_value = 'mockuser'
-
         expected_body = {
             'directory': '/test/helpers/mock_directory/config/.tf_wrapper',
             'status': 'FAILED',
@@ -92,9 +91,23 @@ class TestCli(TestCase):
                 audit_api_url='https://test.com',
                 cwd=os.path.join(os.getcwd(), 'mock_directory/config/.tf_wrapper')
             )
+            flush_audit_api_posts()
 
             response = mocker.last_request.body.decode('utf-8')
             actual_body = json.loads(response)
 
             self.assertEqual(mocker.call_count, 1)
             self.assertEqual(expected_body, actual_body)
+
+    def test_retriable_error_anchors(self):
+        """Test that every retriable error contains a precheck anchor"""
+        for error in RETRIABLE_ERRORS:
+            self.assertTrue(
+                any(anchor in error for anchor in _RETRIABLE_ANCHORS),
+                f'"{error}" contains none of the precheck anchors'
+            )
+
+    def test_has_retriable_error(self):
+        """Test detecting retriable errors in command output"""
+        self.assertTrue(_has_retriable_error('Error creating subnet: Throttling on request'))
+        self.assertFalse(_has_retriable_error('Apply complete! Resources: 3 added, 0 changed.'))